@@ -1,5 +1,9 @@
+from functools import partial
+
 import numpy as np
 import tensorflow as tf
+from tensorflow.core.protobuf.config_pb2 import CallableOptions
+from tensorflow.core.protobuf.rewriter_config_pb2 import RewriterConfig
 
 
 class SimpleNet:
@@ -10,7 +14,14 @@ class SimpleNet:
 
         config = tf.ConfigProto()
         config.gpu_options.allow_growth = True
+        config.graph_options.optimizer_options.global_jit_level = \
+            tf.OptimizerOptions.ON_1
+        if convnet_pars.get('fp16', False):
+            # the rewrite is read from the config when the session is built
+            config.graph_options.rewrite_options.auto_mixed_precision = \
+                RewriterConfig.ON
         self.convnet_pars = convnet_pars
+        self._summary_every = convnet_pars.get('summary_every', 100)
         self._session = tf.Session(config=config)
 
         if load_path is not None:
@@ -18,6 +29,8 @@ class SimpleNet:
         else:
             self._build(convnet_pars)
 
+        self._build_callables()
+
         if self._name == 'train':
             self._train_saver = tf.train.Saver(
                 tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES,
@@ -28,29 +41,56 @@ class SimpleNet:
 
             with tf.variable_scope(self._scope_name):
                 self._target_w = list()
-                self._w = list()
+                assigns = list()
                 with tf.variable_scope('weights_placeholder'):
-                    for i in range(len(w)):
-                        self._target_w.append(tf.placeholder(w[i].dtype,
-                                                             shape=w[i].shape))
-                        self._w.append(w[i].assign(self._target_w[i]))
+                    dtypes = list()
+                    for v in w:
+                        if v.dtype.base_dtype not in dtypes:
+                            dtypes.append(v.dtype.base_dtype)
+                    for dtype in dtypes:
+                        idxs = [i for i in range(len(w))
+                                if w[i].dtype.base_dtype == dtype]
+                        sizes = [w[i].shape.num_elements() for i in idxs]
+                        flat_w = tf.placeholder(dtype, shape=[sum(sizes)])
+                        self._target_w.append((flat_w, idxs))
+                        for i, part in zip(idxs, tf.split(flat_w, sizes)):
+                            assigns.append(
+                                w[i].assign(tf.reshape(part, w[i].shape)))
+                    self._assign_all = tf.group(*assigns)
+
+    @staticmethod
+    def _embedding_dense(inputs, units, n_inputs, activation=None,
+                         kernel_initializer=None,
+                         bias_initializer=tf.zeros_initializer(), name=None):
+        # Same variables of a dense layer applied to a one-hot encoding of
+        # inputs, but the kernel rows are looked up instead of multiplied.
+        with tf.variable_scope(name):
+            kernel = tf.get_variable('kernel', [n_inputs, units],
+                                     initializer=kernel_initializer)
+            bias = tf.get_variable('bias', [units],
+                                   initializer=bias_initializer)
+        out = tf.nn.embedding_lookup(kernel, inputs) + bias
+
+        return out if activation is None else activation(out)
 
     def predict(self, s, features=False):
         #s = np.transpose(s, [0, 2, 3, 1])
+        s = np.ascontiguousarray(s, dtype=np.float32)
         if not features:
-            return self._session.run(self._q, feed_dict={self._x: s})
+            return self._predict_fn(s)[0]
         else:
-            return self._session.run(self._features_2, feed_dict={self._x: s})
+            return self._features_fn(s)[0]
 
     def fit(self, s, a, q):
-        summaries, _ = self._session.run(
-            [self._merged, self._train_step],
-            feed_dict={self._x: s,
-                       self._action: a.ravel().astype(np.uint8),
-                       self._target_q: q}
-        )
-        if hasattr(self, '_train_writer'):
+        s = np.ascontiguousarray(s, dtype=np.float32)
+        a = a.ravel().astype(np.uint8)
+        q = np.ascontiguousarray(q, dtype=np.float32)
+        if hasattr(self, '_train_writer') and \
+                self._train_count % self._summary_every == 0:
+            summaries = self._fit_fn(s, a, q)[0]
             self._train_writer.add_summary(summaries, self._train_count)
+        else:
+            self._train_fn(s, a, q)
 
         self._train_count += 1
 
@@ -59,9 +99,12 @@ class SimpleNet:
                               scope=self._scope_name)
         assert len(w) == len(weights)
 
-        for i in range(len(w)):
-            self._session.run(self._w[i],
-                              feed_dict={self._target_w[i]: weights[i]})
+        feed = dict()
+        for flat_w, idxs in self._target_w:
+            feed[flat_w] = np.concatenate(
+                [np.ravel(weights[i]) for i in idxs]
+            ).astype(flat_w.dtype.as_numpy_dtype, copy=False)
+        self._session.run(self._assign_all, feed_dict=feed)
 
     def get_weights(self, only_trainable=False):
         if not only_trainable:
@@ -103,16 +146,20 @@ class SimpleNet:
 
             with tf.variable_scope('Action'):
                 self._action = tf.placeholder('uint8', [None], name='action')
-
-                action_one_hot = tf.one_hot(self._action,
-                                            convnet_pars['output_shape'][0],
-                                            name='action_one_hot')
-
-            if convnet_pars['n_states'] is not None:
-                x = tf.one_hot(tf.cast(self._x[..., 0], tf.int32),
-                               convnet_pars['n_states'])
+                action_idx = tf.cast(self._action, tf.int32)
+
+            n_states = convnet_pars['n_states']
+            if n_states is not None and \
+                    n_states > convnet_pars.get('embedding_threshold', 10000):
+                x = tf.cast(self._x[..., 0], tf.int32)
+                first_layer = partial(SimpleNet._embedding_dense,
+                                      n_inputs=n_states)
+            elif n_states is not None:
+                x = tf.one_hot(tf.cast(self._x[..., 0], tf.int32), n_states)
+                first_layer = tf.layers.dense
             else:
                 x = self._x[...]
+                first_layer = tf.layers.dense
 
 
 
@@ -120,7 +167,7 @@ class SimpleNet:
 
             with tf.variable_scope('Net'):
                 if convnet_pars["net_type"] == 'features':
-                    self._features_1 = tf.layers.dense(
+                    self._features_1 = first_layer(
                         x, 24,
                         activation=tf.nn.relu,
                         kernel_initializer=tf.glorot_uniform_initializer(),
@@ -139,22 +186,18 @@ class SimpleNet:
                         bias_initializer=tf.glorot_uniform_initializer(),
                         name='q'
                     )
-                    self._q_acted = tf.reduce_sum(self._q * action_one_hot,
-                                      axis=1,
-                                      name='q_acted'
-                    )
+                    self._q_acted = tf.gather(self._q, action_idx,
+                                              batch_dims=1, name='q_acted')
                 else:
-                    self._q = tf.layers.dense(
+                    self._q = first_layer(
                         x,
                         convnet_pars['output_shape'][0],
                         kernel_initializer=tf.glorot_uniform_initializer(),
                         bias_initializer=tf.glorot_uniform_initializer(),
                         name='q'
                     )
-                    self._q_acted = tf.reduce_sum(self._q * action_one_hot,
-                                                  axis=1,
-                                                  name='q_acted'
-                                                  )
+                    self._q_acted = tf.gather(self._q, action_idx,
+                                              batch_dims=1, name='q_acted')
 
 
 
@@ -165,7 +208,10 @@ class SimpleNet:
             )
 
 
-            loss = tf.losses.huber_loss(self._target_q, self._q_acted)
+            diff = self._target_q - self._q_acted
+            abs_diff = tf.abs(diff)
+            loss = tf.reduce_mean(tf.where(abs_diff < 1., 0.5 * tf.square(diff),
+                                           abs_diff - 0.5))
             tf.summary.scalar('huber_loss', loss)
             tf.summary.scalar('average_q', tf.reduce_mean(self._q))
             self._merged = tf.summary.merge(
@@ -190,6 +236,10 @@ class SimpleNet:
             else:
                 raise ValueError('Unavailable optimizer selected.')
 
+            if convnet_pars.get('fp16', False):
+                opt = tf.train.experimental.MixedPrecisionLossScaleOptimizer(
+                    opt, 'dynamic')
+
             self._train_step = opt.minimize(loss=loss)
 
             initializer = tf.variables_initializer(
@@ -208,6 +258,28 @@ class SimpleNet:
 
         self._add_collection()
 
+    def _build_callables(self):
+        # Session.make_callable falls back to run() with a feed_dict when
+        # there are feeds, so the callables are built from CallableOptions.
+        # They are called positionally with arrays of the placeholder dtypes.
+        train_feeds = [self._x, self._action, self._target_q]
+        self._predict_fn = self._make_callable([self._x], [self._q])
+        if self.convnet_pars['net_type'] == 'features':
+            self._features_fn = self._make_callable([self._x],
+                                                    [self._features_2])
+        self._fit_fn = self._make_callable(train_feeds, [self._merged],
+                                           [self._train_step])
+        self._train_fn = self._make_callable(train_feeds, [],
+                                             [self._train_step])
+
+    def _make_callable(self, feeds, fetches, targets=()):
+        options = CallableOptions()
+        options.feed.extend([t.name for t in feeds])
+        options.fetch.extend([t.name for t in fetches])
+        options.target.extend([op.name for op in targets])
+
+        return self._session._make_callable_from_options(options)
+
     @property
     def n_features(self):
         return self._features.shape[-1]
@@ -242,6 +242,7 @@ def experiment(args, agent_algorithm):
             folder_name=folder_name,
             net_type=args.net_type,
             sigma_weight=args.sigma_weight,
+            fp16=args.fp16,
             optimizer={'name': args.optimizer,
                        'lr': args.learning_rate,
                        'lr_sigma': args.learning_rate,
@@ -468,6 +469,9 @@ if __name__ == '__main__':
                               'gradient momentum in rmspropcentered')
     arg_net.add_argument("--epsilon", type=float, default=.01,
                          help='Epsilon term used in rmspropcentered')
+    arg_net.add_argument("--fp16", action='store_true',
+                         help='Whether to use mixed precision (float16) in the '
+                              'network. Only used by dqn.')
 
     arg_alg = parser.add_argument_group('Algorithm')
     arg_alg.add_argument("--alg",
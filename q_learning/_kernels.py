@@ -0,0 +1,52 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _prob_max_counts_loops(q_array):
+    n_actions, n_approximators = q_array.shape
+    counts = np.zeros(n_actions, dtype=np.int64)
+    for a in range(n_actions):
+        for i in range(n_approximators):
+            prod = 1
+            for b in range(n_actions):
+                c = 0
+                for j in range(n_approximators):
+                    if q_array[a, i] >= q_array[b, j]:
+                        c += 1
+                prod *= c
+            counts[a] += prod
+
+    return counts
+
+
+def _prob_max_counts_broadcast(q_array):
+    score = (q_array[:, :, None, None] >= q_array).astype(int)
+
+    return score.sum(axis=3).prod(axis=2).sum(axis=1)
+
+
+def prob_max_counts(q_array):
+    """
+    Count, for each action, the combinations of particles in which the action
+    is the greedy one.
+
+    Args:
+        q_array (np.ndarray): particles with shape (n_actions, n_approximators).
+
+    Returns:
+        The (unnormalized) counts for each action.
+
+    """
+    return _prob_max_counts(q_array)
+
+
+# Interpreted, the loops are much slower than the broadcast: without numba
+# keep the broadcast.
+if njit is not None:
+    _prob_max_counts = njit(cache=True)(_prob_max_counts_loops)
+else:
+    _prob_max_counts = _prob_max_counts_broadcast
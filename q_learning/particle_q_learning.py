@@ -3,6 +3,7 @@ import numpy as np
 from copy import deepcopy
 from mushroom.algorithms.value import TD
 from mushroom.utils.table import EnsembleTable
+from _kernels import prob_max_counts
 
 
 class Particle(TD):
@@ -37,9 +38,8 @@ class ParticleQLearning(Particle):
 
     @staticmethod
     def _compute_prob_max(q_list):
-        q_array = np.array(q_list).T
-        score = (q_array[:, :, None, None] >= q_array).astype(int)
-        prob = score.sum(axis=3).prod(axis=2).sum(axis=1)
+        q_array = np.ascontiguousarray(np.array(q_list).T)
+        prob = prob_max_counts(q_array)
         prob = prob.astype(np.float32)
         return prob / np.sum(prob)
 
@@ -1,5 +1,10 @@
 import sys
 import os
+# one thread per experiment: the parallelism comes from joblib
+for _var in ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+             'NUMEXPR_NUM_THREADS']:
+    os.environ.setdefault(_var, '1')
+del _var
 import argparse
 import numpy as np
 import warnings
@@ -11,7 +16,6 @@ from scipy.stats import norm
 from mushroom.core import Core
 from mushroom.environments.generators.taxi import generate_taxi
 from mushroom.environments.gym_env import Gym
-from mushroom.utils.callbacks import CollectDataset
 from mushroom.utils.dataset import parse_dataset
 from mushroom.utils.parameters import ExponentialDecayParameter, Parameter
 from mushroom.policy.td_policy import EpsGreedy, Boltzmann
@@ -35,7 +39,7 @@ from envs.six_arms import generate_arms
 from envs.three_arms import generate_arms as generate_three_arms
 import envs.knight_quest
 from gym.envs.registration import register
-from utils.callbacks import CollectQs, CollectVs
+from utils.callbacks import CollectQs, CollectVs, CollectScores
 
 policy_dict = {'eps-greedy': EpsGreedy,
                'boltzmann': Boltzmann,
@@ -57,33 +61,27 @@ def set_global_seeds(i):
 
 
 def compute_scores(dataset, gamma):
-    scores = list()
-    disc_scores = list()
-    lens = list()
-
-    score = 0.
-    disc_score = 0.
-    episode_steps = 0
-    n_episodes = 0
-    for i in range(len(dataset)):
-        score += dataset[i][2]
-        disc_score += dataset[i][2] * gamma ** episode_steps
-        episode_steps += 1
-        if dataset[i][-1]:
-            scores.append(score)
-            disc_scores.append(disc_score)
-            lens.append(episode_steps)
-            score = 0.
-            disc_score = 0.
-            episode_steps = 0
-            n_episodes += 1
-
-    if len(scores) > 0:
-        return len(dataset), np.min(scores), np.max(scores), np.mean(scores), np.std(scores),  \
+    n_samples = len(dataset)
+    rewards = np.fromiter((t[2] for t in dataset), dtype=np.float64,
+                          count=n_samples)
+    done = np.fromiter((t[-1] for t in dataset), dtype=bool, count=n_samples)
+
+    ends = np.flatnonzero(done) + 1
+    n_episodes = len(ends)
+    if n_episodes > 0:
+        starts = np.concatenate(([0], ends[:-1]))
+        lens = ends - starts
+        rewards = rewards[:ends[-1]]
+        steps = np.arange(ends[-1]) - np.repeat(starts, lens)
+        gpow = gamma ** np.arange(lens.max())
+        scores = np.add.reduceat(rewards, starts)
+        disc_scores = np.add.reduceat(rewards * gpow[steps], starts)
+
+        return n_samples, np.min(scores), np.max(scores), np.mean(scores), np.std(scores),  \
                np.min(disc_scores), np.max(disc_scores), np.mean(disc_scores), \
                np.std(disc_scores), np.mean(lens), n_episodes
     else:
-        return len(dataset), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+        return n_samples, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
 
 class TheoreticalParameter(Parameter):
 
@@ -452,8 +450,8 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         raise ValueError()
 
     # Algorithm
-    collect_dataset = CollectDataset()
-    callbacks = [collect_dataset]
+    collect_scores = CollectScores(mdp.info.gamma)
+    callbacks = [collect_scores]
     if collect_qs:
         if algorithm not in ['r-max']:
             collect_qs_callback = CollectQs(agent.approximator)
@@ -476,13 +474,12 @@ def experiment(algorithm, name, update_mode, update_type, policy, n_approximator
         if regret_test:
             collect_vs_callback.on()
         core.learn(n_steps=evaluation_frequency, n_steps_per_fit=1, quiet=True)
-        dataset = collect_dataset.get()
-        scores = compute_scores(dataset, mdp.info.gamma)
+        scores = collect_scores.get_scores()
 
         #print('Train: ', scores)
         train_scores.append(scores)
 
-        collect_dataset.clean()
+        collect_scores.clean()
         mdp.reset()
         if regret_test:
             vs = collect_vs_callback.get_values()
@@ -726,7 +723,7 @@ if __name__ == '__main__':
                                     args.value_iterations, args.tolerance, file_name, out_dir]
                         start = time.time()
                         if n_experiment > 1:
-                            out = Parallel(n_jobs=affinity)(delayed(experiment)(*(fun_args + [args.collect_qs if i==0 else False, args.seed+i])) for i in range(n_experiment))
+                            out = Parallel(n_jobs=affinity, batch_size=1)(delayed(experiment)(*(fun_args + [args.collect_qs if i==0 else False, args.seed+i])) for i in range(n_experiment))
                         else:
                             out = [experiment(*(fun_args + [False, 0]))]
                         end = time.time()
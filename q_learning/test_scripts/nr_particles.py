@@ -49,33 +49,39 @@ def set_global_seeds(i):
 
 
 def compute_scores(dataset, gamma):
-    scores = list()
-    disc_scores = list()
-    lens = list()
+    scores = np.empty(len(dataset), dtype=np.float64)
+    disc_scores = np.empty_like(scores)
+    lens = np.empty(len(dataset), dtype=np.int64)
 
     score = 0.
     disc_score = 0.
+    discount = 1.
     episode_steps = 0
     n_episodes = 0
     for i in range(len(dataset)):
         score += dataset[i][2]
-        disc_score += dataset[i][2] * gamma ** episode_steps
+        disc_score += dataset[i][2] * discount
+        discount *= gamma
         episode_steps += 1
         if dataset[i][-1]:
-            scores.append(score)
-            disc_scores.append(disc_score)
-            lens.append(episode_steps)
+            scores[n_episodes] = score
+            disc_scores[n_episodes] = disc_score
+            lens[n_episodes] = episode_steps
             score = 0.
             disc_score = 0.
+            discount = 1.
             episode_steps = 0
             n_episodes += 1
 
-    if len(scores) > 0:
+    scores = scores[:n_episodes]
+    disc_scores = disc_scores[:n_episodes]
+    lens = lens[:n_episodes]
+    if n_episodes > 0:
         return len(dataset), np.min(scores), np.max(scores), np.mean(scores), np.std(scores), \
                np.min(disc_scores), np.max(disc_scores), np.mean(disc_scores), \
                np.std(disc_scores), np.mean(lens), n_episodes
     else:
-        return len(dataset), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+        return len(dataset), 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
 
 
 def experiment(algorithm, name, update_mode, update_type, policy, n_approximators, q_max, q_min, lr_exp, double,
@@ -96,3 +96,81 @@ class CollectVs:
 
         """
         return self._vs
+
+
+class CollectScores:
+    """
+    This callback computes the scores of the episodes online, keeping only
+    the running per-episode returns instead of the samples.
+
+    """
+    def __init__(self, gamma):
+        """
+        Constructor.
+
+        Args:
+            gamma (float): the discount factor used for the discounted returns.
+
+        """
+        self._gamma = gamma
+
+        self._reset_scores()
+
+    def __call__(self, **kwargs):
+        """
+        Update the running returns with the new samples.
+
+        Args:
+            **kwargs (dict): dictionary with the ``dataset`` of new samples.
+
+        """
+        for sample in kwargs['dataset']:
+            self._n_samples += 1
+            self._cur_score += sample[2]
+            self._cur_disc_score += sample[2] * self._cur_discount
+            self._cur_discount *= self._gamma
+            self._cur_steps += 1
+            if sample[-1]:
+                self._episode_sums.append(self._cur_score)
+                self._episode_disc_sums.append(self._cur_disc_score)
+                self._episode_lens.append(self._cur_steps)
+                self._cur_score = 0.
+                self._cur_disc_score = 0.
+                self._cur_discount = 1.
+                self._cur_steps = 0
+
+    def get_scores(self):
+        """
+        Returns:
+             The scores of the completed episodes, in the same format of
+             ``compute_scores``.
+
+        """
+        if len(self._episode_sums) > 0:
+            scores = np.array(self._episode_sums)
+            disc_scores = np.array(self._episode_disc_sums)
+            lens = np.array(self._episode_lens)
+
+            return self._n_samples, np.min(scores), np.max(scores), \
+                np.mean(scores), np.std(scores), np.min(disc_scores), \
+                np.max(disc_scores), np.mean(disc_scores), \
+                np.std(disc_scores), np.mean(lens), len(scores)
+        else:
+            return self._n_samples, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+
+    def clean(self):
+        """
+        Reset the running returns.
+
+        """
+        self._reset_scores()
+
+    def _reset_scores(self):
+        self._episode_sums = list()
+        self._episode_disc_sums = list()
+        self._episode_lens = list()
+        self._n_samples = 0
+        self._cur_score = 0.
+        self._cur_disc_score = 0.
+        self._cur_discount = 1.
+        self._cur_steps = 0